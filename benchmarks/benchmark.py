@@ -0,0 +1,165 @@
+"""
+Benchmark listing and downloading recordings against the mock Zoom API in
+mock_zoom_server.py, offline and reproducibly. The mock account is listed user by
+user with get_user_recordings, then every listed recording file is downloaded
+with the download engine. The time, API requests (counted by the server, 429
+responses included) and download throughput of each stage are printed as JSON.
+
+python benchmarks/benchmark.py --users 50 --meetings 20 --skew 1.2 --mp4-size 4194304 --rate-limit 30
+
+Settings of zoom_meeting_download.py can be set with --settings <file>, a JSON file
+of settings used over the benchmark's own (e.g. {"api_rate": 30, "listing_workers": 8}).
+The benchmark runs in a temporary directory that is removed afterwards.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from datetime import timedelta
+import json
+import os
+import shutil
+import sys
+import tempfile
+from time import monotonic
+
+import mock_zoom_server
+
+
+"""
+Print usage.
+"""
+def usage():
+    print("python benchmarks/benchmark.py [options]")
+    print("Options of the mock account and server, see mock_zoom_server.py:")
+    print("  --users --meetings --days --skew --mp4-size --seed")
+    print("  --api-latency --download-latency --download-rate --rate-limit --every-429")
+    print("Benchmark options:")
+    print("  --engine           download engine, \"multiprocessing\" (default) or \"asyncio\"")
+    print("  --workers          number of download workers, defaults to 8")
+    print("  --batch-workers    number of users listed at the same time, defaults to 4")
+    print("  --settings         JSON file of settings used over the benchmark's")
+    print("  --skip-download    only benchmark listing")
+    print("  --verbose          log what zoom_meeting_download.py does")
+
+
+"""
+Get the settings zoom_meeting_download.py runs with: the mock server, everything
+stored in the benchmark directory and caches, the manifest and uploads turned off
+so every run lists and downloads everything.
+"""
+def get_benchmark_settings(server, directory, workers, extra_settings):
+    settings = {
+        "earliest_date": "2000-01-01",
+        "download_directory": directory + "/downloads/",
+        "zoom": {"url": "127.0.0.1:" + str(server.port), "scheme": "http", "client_id": "mock", "client_secret": "mock", "account_id": "mock"},
+        "token_cache_file": directory + "/token_cache.json",
+        "manifest_file": None,
+        "listing_cache_directory": None,
+        "upload_remote": None,
+        "metrics_file": None,
+        "progress_report_seconds": 3600,
+        "download_workers": workers,
+        "max_download_workers": workers,
+    }
+    settings.update(extra_settings)
+    return settings
+
+
+"""
+List every user of the mock account like batch mode does and return the
+(meeting, directory) download jobs and the results of the listing.
+"""
+def benchmark_listing(zoom, server, batch_workers, from_date, to_date):
+    def list_user(user):
+        zoom_user = zoom.find_zoom_user(user["email"])
+        directory = zoom.make_user_directory(user["email"], {}, from_date, to_date)
+        meetings = zoom.get_user_recordings(zoom_user["id"], zoom.get_user_start_date(zoom_user, from_date), to_date)
+        return [(meeting, directory) for meeting in meetings]
+
+    server.reset_counts()
+    started = monotonic()
+    with ThreadPoolExecutor(max_workers=batch_workers) as executor:
+        jobs = [job for user_jobs in executor.map(list_user, server.account.users) for job in user_jobs]
+    seconds = monotonic() - started
+    counts = server.reset_counts()
+    expected = sum(len(server.account.get_meetings(user["id"], str(from_date), str(to_date))) for user in server.account.users)
+    return (jobs, {
+        "seconds": seconds,
+        "users": len(server.account.users),
+        "meetings": len(jobs),
+        "missing_meetings": expected - len(jobs),
+        "api_requests": sum(count for (endpoint, count) in counts.items() if endpoint != "429"),
+        "api_requests_429": counts.get("429", 0),
+        "api_requests_by_endpoint": counts,
+    })
+
+
+"""
+Download the recording files of jobs with the download engine and return the
+results.
+"""
+def benchmark_download(zoom, server, jobs, engine, directory):
+    server.reset_counts()
+    started = monotonic()
+    zoom.download_zoom_recordings(iter(jobs), {"engine": engine})
+    seconds = monotonic() - started
+    counts = server.reset_counts()
+    (files, size) = (0, 0)
+    for (path, _, filenames) in os.walk(directory):
+        for filename in filenames:
+            if not filename.endswith(".part"):
+                files += 1
+                size += os.path.getsize(os.path.join(path, filename))
+    expected_files = sum(len(meeting["recording_files"]) for (meeting, _) in jobs)
+    return {
+        "seconds": seconds,
+        "engine": engine,
+        "files": files,
+        "missing_files": expected_files - files,
+        "bytes": size,
+        "mb_per_second": size / 1048576 / seconds,
+        "files_per_second": files / seconds,
+        "download_requests": counts.get("GET /rec/download", 0),
+        "api_requests": sum(count for (endpoint, count) in counts.items() if endpoint not in ("429", "GET /rec/download")),
+    }
+
+
+def main(argv):
+    benchmark_options = {"engine": str, "workers": int, "batch-workers": int, "settings": str, "skip-download": bool, "verbose": bool}
+    (account_args, server_args, args) = mock_zoom_server.parse_args(argv, benchmark_options, usage)
+    extra_settings = {}
+    if "settings" in args:
+        with open(args["settings"]) as settings_file:
+            extra_settings = json.load(settings_file)
+
+    account = mock_zoom_server.MockZoomAccount(**account_args)
+    server = mock_zoom_server.MockZoomServer(account, **server_args).start()
+    repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    directory = tempfile.mkdtemp(prefix="zoom_benchmark_")
+    cwd = os.getcwd()
+    try:
+        # relative paths (logs/) end up in the benchmark directory, the download
+        # workers start there too
+        os.chdir(directory)
+        sys.path.insert(0, repository)
+        import zoom_meeting_download as zoom
+        if "verbose" in args:
+            zoom.setup_logging()
+        zoom.settings = get_benchmark_settings(server, directory, args.get("workers", 8), extra_settings)
+        os.makedirs(zoom.settings["download_directory"], exist_ok=True)
+
+        to_date = date.today()
+        from_date = to_date - timedelta(days=account_args.get("days", 365) + 1)
+        (jobs, listing) = benchmark_listing(zoom, server, args.get("batch_workers", 4), from_date, to_date)
+        results = {"account": dict(account_args, total_bytes=account.get_total_size()), "server": server_args, "settings": extra_settings, "listing": listing}
+        if "skip_download" not in args:
+            results["download"] = benchmark_download(zoom, server, jobs, args.get("engine", "multiprocessing"), zoom.settings["download_directory"])
+        print(json.dumps(results, indent=4))
+    finally:
+        os.chdir(cwd)
+        server.stop()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,369 @@
+"""
+A local mock of the parts of the Zoom API zoom_meeting_download.py uses, for
+benchmarking it offline: /oauth/token, /v2/users, /v2/users/{id},
+/v2/users/{id}/recordings and /v2/accounts/{id}/recordings with pagination and
+429 responses, and download URLs serving synthetic recording files of a
+configurable size with Range support and latency.
+
+Run it on its own and point a settings file at it with "zoom": {"url":
+"127.0.0.1:8765", "scheme": "http", ...}:
+
+python benchmarks/mock_zoom_server.py --port 8765 --users 50 --meetings 20
+
+or start a MockZoomServer from a benchmark, see benchmark.py.
+"""
+
+from datetime import datetime
+from datetime import timedelta
+import getopt
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import sys
+import threading
+from time import monotonic, sleep
+from urllib.parse import parse_qs, urlparse
+
+
+#===============================================================================
+#= Account
+#===============================================================================
+
+
+# File types of a recorded meeting with their size relative to the MP4
+recording_file_types = [
+    ("MP4", "shared_screen_with_speaker_view", 1.0),
+    ("M4A", "audio_only", 0.1),
+    ("TRANSCRIPT", "audio_transcript", 0.001),
+    ("CHAT", "chat_file", 0.0001),
+]
+
+
+"""
+A Zoom account of synthetic users and recordings. Each user gets meetings
+recordings on average, spread over the last days days. With skew > 1 the number of
+meetings per user follows a Pareto distribution with that shape instead, so a few
+users have most of the recordings like on a real campus (1.2 is close to one). MP4
+files are mp4_size bytes, the other files of a meeting are smaller (see
+recording_file_types). reprocess makes a new version of a file, like Zoom does when
+it reprocesses a recording: its ETag changes and so do its bytes.
+"""
+class MockZoomAccount:
+    def __init__(self, users=10, meetings=20, days=365, skew=0, mp4_size=1048576, seed=1):
+        self.random = random.Random(seed)
+        self.mp4_size = mp4_size
+        self.users = []
+        self.recordings = {}
+        self.versions = {}
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        for i in range(users):
+            user = {
+                "id": "u%05d" % i,
+                "email": "user%05d@example.edu" % i,
+                "type": 2,
+                "status": "active",
+                "created_at": (today - timedelta(days=days + 30)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }
+            self.users.append(user)
+            if skew > 1:
+                # the mean of paretovariate(skew) is skew / (skew - 1)
+                count = min(int(meetings * (skew - 1) / skew * self.random.paretovariate(skew)), meetings * 50)
+            else:
+                count = meetings
+            self.recordings[user["id"]] = sorted([self.make_meeting(user, j, today - timedelta(seconds=self.random.randrange(days * 86400))) for j in range(count)], key=lambda meeting: meeting["start_time"], reverse=True)
+        self.users_by_key = {key: user for user in self.users for key in (user["id"], user["email"])}
+
+    def make_meeting(self, user, number, start_time):
+        uuid = "%s-m%05d" % (user["id"], number)
+        files = []
+        for (file_type, recording_type, relative_size) in recording_file_types:
+            size = max(int(self.mp4_size * relative_size), 1)
+            files.append({
+                "id": uuid + "-" + file_type.lower(),
+                "meeting_id": uuid,
+                "recording_start": start_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "file_type": file_type,
+                "recording_type": recording_type,
+                "file_size": size,
+                "status": "completed",
+                # the server fills in its own address
+                "download_url": "/rec/download/" + uuid + "-" + file_type.lower() + "?size=" + str(size),
+            })
+        return {
+            "uuid": uuid,
+            "id": number,
+            "host_id": user["id"],
+            "host_email": user["email"],
+            "topic": "Meeting %d of %s" % (number, user["email"]),
+            "start_time": start_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "duration": 60,
+            "total_size": sum(f["file_size"] for f in files),
+            "recording_count": len(files),
+            "recording_files": files,
+        }
+
+    def get_meetings(self, user_id=None, from_date="", to_date=""):
+        if user_id is None:
+            meetings = [meeting for user in self.users for meeting in self.recordings[user["id"]]]
+        else:
+            meetings = self.recordings[user_id]
+        return [meeting for meeting in meetings if (from_date == "" or meeting["start_time"][:10] >= from_date) and (to_date == "" or meeting["start_time"][:10] <= to_date)]
+
+    def reprocess(self, file_id):
+        self.versions[file_id] = self.versions.get(file_id, 0) + 1
+
+    def get_total_size(self):
+        return sum(meeting["total_size"] for meetings in self.recordings.values() for meeting in meetings)
+
+
+#===============================================================================
+#= Server
+#===============================================================================
+
+
+"""
+Serve a MockZoomAccount over HTTP on 127.0.0.1:port (0 picks a free port).
+API requests wait api_latency seconds. Zoom's rate limit is emulated by answering
+429 with Retry-After: 1 when more than rate_limit API requests per second are
+made, and every every_429th API request if every_429 is set. Downloads wait
+download_latency seconds before the first byte and are sent at up to download_rate
+MB/s per connection if it is set. Requests are counted by endpoint in counts.
+"""
+class MockZoomServer:
+    def __init__(self, account, port=0, api_latency=0, download_latency=0, download_rate=None, rate_limit=None, every_429=None, page_size=300):
+        self.account = account
+        self.api_latency = api_latency
+        self.download_latency = download_latency
+        self.download_rate = download_rate
+        self.rate_limit = rate_limit
+        self.every_429 = every_429
+        self.page_size = page_size
+        self.counts = {}
+        self.lock = threading.Lock()
+        self.api_requests = 0
+        self.second = 0
+        self.second_requests = 0
+        server = self
+
+        class Handler(MockZoomHandler):
+            mock = server
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def count(self, endpoint):
+        with self.lock:
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+
+    def reset_counts(self):
+        with self.lock:
+            counts = self.counts
+            self.counts = {}
+        return counts
+
+    def is_rate_limited(self):
+        with self.lock:
+            self.api_requests += 1
+            if self.every_429 and self.api_requests % self.every_429 == 0:
+                return True
+            if self.rate_limit is None:
+                return False
+            second = int(monotonic())
+            if second != self.second:
+                self.second = second
+                self.second_requests = 0
+            self.second_requests += 1
+            return self.second_requests > self.rate_limit
+
+
+class MockZoomHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    mock = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, body, status=200, headers={}):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for (name, value) in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip("/")
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > 0:
+            self.rfile.read(length)
+        self.mock.count("POST " + path)
+        if path == "/oauth/token":
+            self.send_json({"access_token": "mock-token", "token_type": "bearer", "expires_in": 3599})
+        else:
+            self.send_json({"code": 404, "message": "Not found"}, 404)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for (key, values) in parse_qs(url.query).items()}
+        parts = url.path.strip("/").split("/")
+        if parts[0] == "rec":
+            self.mock.count("GET /rec/download")
+            return self.send_recording_file(parts[-1], query)
+        endpoint = "/".join("{id}" if i > 0 and parts[i - 1] in ("users", "accounts") else part for (i, part) in enumerate(parts))
+        self.mock.count("GET /" + endpoint)
+        if self.mock.api_latency:
+            sleep(self.mock.api_latency)
+        if self.mock.is_rate_limited():
+            self.mock.count("429")
+            return self.send_json({"code": 429, "message": "You have reached the maximum per-second rate limit for this API."}, 429, {"Retry-After": "1", "X-RateLimit-Type": "QPS"})
+        if endpoint == "v2/users":
+            return self.send_page(self.mock.account.users, "users", query)
+        if endpoint == "v2/users/{id}":
+            user = self.mock.account.users_by_key.get(parts[2])
+            if user is None:
+                return self.send_json({"code": 1001, "message": "User does not exist: " + parts[2]}, 404)
+            return self.send_json(user)
+        if endpoint == "v2/users/{id}/recordings":
+            user = self.mock.account.users_by_key.get(parts[2])
+            if user is None:
+                return self.send_json({"code": 1001, "message": "User does not exist: " + parts[2]}, 404)
+            meetings = self.mock.account.get_meetings(user["id"], query.get("from", ""), query.get("to", ""))
+            return self.send_page(self.get_download_meetings(meetings), "meetings", query, {"from": query.get("from", ""), "to": query.get("to", "")})
+        if endpoint == "v2/accounts/{id}/recordings":
+            meetings = self.mock.account.get_meetings(None, query.get("from", ""), query.get("to", ""))
+            return self.send_page(self.get_download_meetings(meetings), "meetings", query, {"from": query.get("from", ""), "to": query.get("to", "")})
+        self.send_json({"code": 404, "message": "Not found"}, 404)
+
+    def send_page(self, items, key, query, extra={}):
+        page_size = min(int(query.get("page_size", 30)), self.mock.page_size)
+        start = int(query.get("next_page_token") or 0)
+        end = start + page_size
+        body = {"page_size": page_size, "total_records": len(items), "next_page_token": str(end) if end < len(items) else "", key: items[start:end]}
+        body.update(extra)
+        self.send_json(body)
+
+    def get_download_meetings(self, meetings):
+        host = "http://127.0.0.1:" + str(self.mock.port)
+        return [dict(meeting, recording_files=[dict(f, download_url=host + f["download_url"]) for f in meeting["recording_files"]]) for meeting in meetings]
+
+    def send_recording_file(self, file_id, query):
+        size = int(query.get("size", self.mock.account.mp4_size))
+        version = self.mock.account.versions.get(file_id, 0)
+        etag = "\"%s-%d\"" % (file_id, version)
+        start = 0
+        if self.mock.download_latency:
+            sleep(self.mock.download_latency)
+        requested_range = self.headers.get("Range")
+        # a Range for another version of the file is ignored, the whole file is sent
+        if self.headers.get("If-Range") not in (None, etag):
+            requested_range = None
+        if requested_range is not None and requested_range.startswith("bytes="):
+            start = int(requested_range[len("bytes="):].split("-")[0])
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", "bytes */" + str(size))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %d-%d/%d" % (start, size - 1, size))
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(size - start))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        # every byte of a version of a file is the version number
+        chunk = bytes([version % 256]) * 65536
+        sent = start
+        started = monotonic()
+        while sent < size:
+            data = chunk[:min(len(chunk), size - sent)]
+            self.wfile.write(data)
+            sent += len(data)
+            if self.mock.download_rate:
+                wait = (sent - start) / (self.mock.download_rate * 1048576) - (monotonic() - started)
+                if wait > 0:
+                    sleep(wait)
+
+
+#===============================================================================
+#= Main
+#===============================================================================
+
+
+"""
+Print usage.
+"""
+def usage():
+    print("python benchmarks/mock_zoom_server.py [options]")
+    print("Options:")
+    print("  --port             port to listen on, defaults to 8765")
+    print("  --users            number of users, defaults to 10")
+    print("  --meetings         recorded meetings per user (on average with --skew), defaults to 20")
+    print("  --days             days the recordings are spread over, defaults to 365")
+    print("  --skew             Pareto shape (> 1) of the meetings per user, e.g. 1.2, defaults to 0 (every user the same)")
+    print("  --mp4-size         bytes of each MP4 file, defaults to 1048576")
+    print("  --api-latency      seconds each API request takes, defaults to 0")
+    print("  --download-latency seconds before the first byte of a download, defaults to 0")
+    print("  --download-rate    MB/s of each download, defaults to no limit")
+    print("  --rate-limit       API requests per second before answering 429, defaults to no limit")
+    print("  --every-429        answer every nth API request with 429, defaults to never")
+    print("  --seed             random seed of the account, defaults to 1")
+
+
+"""
+Parse the command line options into the keyword arguments of MockZoomAccount and
+MockZoomServer, and of extra_options ({option: type}, bool for a flag without a
+value) for a benchmark using the server. usage is called for --help or unknown
+options.
+"""
+def parse_args(argv, extra_options={}, usage=usage):
+    account_options = {"users": int, "meetings": int, "days": int, "skew": float, "mp4-size": int, "seed": int}
+    server_options = {"port": int, "api-latency": float, "download-latency": float, "download-rate": float, "rate-limit": int, "every-429": int}
+    try:
+        opts, args = getopt.getopt(argv, "h", ["help"] + [option + "=" for option in list(account_options) + list(server_options)] + [option + ("" if option_type is bool else "=") for (option, option_type) in extra_options.items()])
+    except getopt.GetoptError as e:
+        print(str(e))
+        usage()
+        sys.exit(2)
+    (account_args, server_args, extra_args) = ({}, {}, {})
+    for (opt, arg) in opts:
+        if opt in ("-h", "--help"):
+            usage()
+            sys.exit(0)
+        option = opt[2:]
+        for (options, option_args) in ((account_options, account_args), (server_options, server_args), (extra_options, extra_args)):
+            if option in options:
+                option_args[option.replace("-", "_")] = True if options[option] is bool else options[option](arg)
+    return (account_args, server_args, extra_args)
+
+
+def main(argv):
+    (account_args, server_args, _) = parse_args(argv)
+    server_args.setdefault("port", 8765)
+    account = MockZoomAccount(**account_args)
+    server = MockZoomServer(account, **server_args)
+    meetings = sum(len(meetings) for meetings in account.recordings.values())
+    print("Mock Zoom API with " + str(len(account.users)) + " users, " + str(meetings) + " meetings and " + str(round(account.get_total_size() / 1048576, 1)) + " MB of recordings on 127.0.0.1:" + str(server.port))
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
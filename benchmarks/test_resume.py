@@ -0,0 +1,188 @@
+"""
+Regression tests of resuming downloads, run against the mock Zoom API in
+mock_zoom_server.py: a ".part" file left by a failed download is resumed where it
+stopped unless Zoom has reprocessed the recording since, and a run started after
+one that stopped downloads the files the journal has left unfinished.
+
+python -m pytest benchmarks
+"""
+
+from datetime import date
+from datetime import timedelta
+import os
+import sqlite3
+import sys
+
+import pytest
+
+import mock_zoom_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import zoom_meeting_download as zoom
+
+
+# Bytes a test writes to a ".part" file, the mock server only sends version numbers
+PART_BYTE = b"\xff"
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    account = mock_zoom_server.MockZoomAccount(users=2, meetings=3, days=60, mp4_size=200000)
+    server = mock_zoom_server.MockZoomServer(account).start()
+    # relative paths (logs/) end up in the test directory, the download workers start there too
+    monkeypatch.chdir(tmp_path)
+    zoom.settings = {
+        "earliest_date": "2000-01-01",
+        "download_directory": str(tmp_path) + "/",
+        "zoom": {"url": "127.0.0.1:" + str(server.port), "scheme": "http", "client_id": "mock", "client_secret": "mock", "account_id": "mock"},
+        "token_cache_file": str(tmp_path / "token_cache.json"),
+        "manifest_file": str(tmp_path / "download_manifest.db"),
+        "listing_cache_directory": None,
+        "upload_remote": None,
+        "metrics_file": None,
+        "progress_report_seconds": 3600,
+        "api_rate": 1000,
+        "download_workers": 2,
+    }
+    # state left by an earlier test
+    zoom.manifest_connections.connection = None
+    zoom.progress = None
+    zoom.rate_limiter = None
+    zoom.token = None
+    yield server
+    server.stop()
+
+
+"""
+Get the (meeting, file, directory) download jobs of every recording file of the
+mock account, each user's in their own directory.
+"""
+def get_file_jobs(server):
+    jobs = []
+    for user in server.account.users:
+        directory = zoom.make_user_directory(user["email"], {}, date.today() - timedelta(days=90), date.today())
+        for meeting in zoom.get_user_recordings(user["id"], date.today() - timedelta(days=90), date.today()):
+            for f in meeting["recording_files"]:
+                jobs.append((meeting, f, directory))
+    return jobs
+
+
+"""
+Leave a ".part" file of the first size bytes of a recording file, as a failed
+download of that version of the file would have.
+"""
+def write_part_file(path, size, file_id, version=0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".part", "wb") as part_file:
+        part_file.write(PART_BYTE * size)
+    with open(path + ".part.validator", "w") as validator_file:
+        validator_file.write("\"%s-%d\"" % (file_id, version))
+
+
+def read_file(path):
+    with open(path, "rb") as downloaded_file:
+        return downloaded_file.read()
+
+
+def test_part_file_is_resumed(server):
+    (meeting, f, directory) = get_file_jobs(server)[0]
+    path = zoom.get_recording_path(meeting, f, directory)
+    write_part_file(path, 1000, f["id"])
+    zoom.download_file(f["download_url"], path, f["file_size"])
+    data = read_file(path)
+    assert data == PART_BYTE * 1000 + b"\0" * (f["file_size"] - 1000)
+    assert not os.path.exists(path + ".part")
+    assert not os.path.exists(path + ".part.validator")
+
+
+def test_complete_part_file_is_finished(server):
+    (meeting, f, directory) = get_file_jobs(server)[0]
+    path = zoom.get_recording_path(meeting, f, directory)
+    write_part_file(path, f["file_size"], f["id"])
+    zoom.download_file(f["download_url"], path, f["file_size"])
+    assert read_file(path) == PART_BYTE * f["file_size"]
+
+
+def test_part_file_of_reprocessed_recording_is_restarted(server):
+    (meeting, f, directory) = get_file_jobs(server)[0]
+    path = zoom.get_recording_path(meeting, f, directory)
+    write_part_file(path, 1000, f["id"])
+    server.account.reprocess(f["id"])
+    zoom.download_file(f["download_url"], path, f["file_size"])
+    assert read_file(path) == b"\1" * f["file_size"]
+
+
+def test_part_file_without_validator_is_restarted(server):
+    (meeting, f, directory) = get_file_jobs(server)[0]
+    path = zoom.get_recording_path(meeting, f, directory)
+    write_part_file(path, 1000, f["id"])
+    os.remove(path + ".part.validator")
+    zoom.download_file(f["download_url"], path, f["file_size"])
+    assert read_file(path) == b"\0" * f["file_size"]
+
+
+@pytest.mark.parametrize("engine", ["multiprocessing", "asyncio"])
+def test_journal_is_resumed(server, engine):
+    jobs = get_file_jobs(server)
+    # a run that stopped after journaling every file, with the first one in flight
+    # and partly downloaded and the second one done
+    for job in jobs:
+        assert zoom.journal_file_job(*job)
+    (meeting, f, directory) = jobs[0]
+    zoom.start_file_job(meeting, f, directory)
+    in_flight_path = zoom.get_recording_path(meeting, f, directory)
+    write_part_file(in_flight_path, 1000, f["id"])
+    (meeting, f, directory) = jobs[1]
+    zoom.download_file(f["download_url"], zoom.get_recording_path(meeting, f, directory), f["file_size"])
+    zoom.record_file_result("done", meeting, f, zoom.get_recording_path(meeting, f, directory))
+    zoom.progress = None
+    server.reset_counts()
+
+    zoom.download({"resume": True, "engine": engine})
+
+    counts = server.reset_counts()
+    # nothing is listed, every file left is downloaded once
+    assert set(counts) == {"GET /rec/download"}
+    assert counts["GET /rec/download"] == len(jobs) - 1
+    for (meeting, f, directory) in jobs:
+        assert os.path.getsize(zoom.get_recording_path(meeting, f, directory)) == f["file_size"]
+    assert read_file(in_flight_path)[:1000] == PART_BYTE * 1000
+    manifest = sqlite3.connect(zoom.settings["manifest_file"])
+    assert manifest.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall() == [("done", len(jobs))]
+
+
+def test_part_file_of_wrong_range_is_discarded(server):
+    (meeting, f, directory) = get_file_jobs(server)[0]
+    path = zoom.get_recording_path(meeting, f, directory)
+    write_part_file(path, 1000, f["id"])
+    sink = zoom.get_download_sink(path)
+    response_headers = {"content-range": "bytes 0-%d/%d" % (f["file_size"] - 1, f["file_size"]), "content-length": str(f["file_size"])}
+    with pytest.raises(IOError):
+        zoom.get_download_range(sink, path, 1000, f["file_size"], 206, response_headers)
+    assert not os.path.exists(path + ".part")
+    assert zoom.get_resume_headers(sink, path, f["file_size"]) == (0, {})
+
+
+def test_download_of_wrong_size_fails(server):
+    (meeting, f, directory) = get_file_jobs(server)[0]
+    path = zoom.get_recording_path(meeting, f, directory)
+    with pytest.raises(IOError):
+        zoom.get_download_range(zoom.get_download_sink(path), path, 0, f["file_size"] + 1, 200, {"content-length": str(f["file_size"])})
+
+
+def test_journal_of_running_run_is_left_to_it(server):
+    jobs = get_file_jobs(server)
+    for job in jobs:
+        assert zoom.journal_file_job(*job)
+    manifest = sqlite3.connect(zoom.settings["manifest_file"])
+    with manifest:
+        # a run on another host that is still going
+        manifest.execute("UPDATE jobs SET owner = 'otherhost:1'")
+        manifest.execute("INSERT INTO runs VALUES ('otherhost:1', ?)", (zoom.datetime.now().isoformat(),))
+    assert zoom.get_unfinished_file_jobs() == []
+    assert not zoom.journal_file_job(*jobs[0])
+    with manifest:
+        # and has stopped since
+        manifest.execute("UPDATE runs SET heartbeat = ?", ((zoom.datetime.now() - timedelta(hours=1)).isoformat(),))
+    assert len(zoom.get_unfinished_file_jobs()) == len(jobs)
+    assert manifest.execute("SELECT DISTINCT owner FROM jobs").fetchall() == [(zoom.get_run_owner(),)]